@@ -1,13 +1,28 @@
 # gologin_api.py
-import json
+import contextlib
+import functools
 import logging
+import os
+import sqlite3
 import sys
+import threading
+import time
 from pathlib import Path
-from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
 
+import orjson
 import requests
+import urllib3
 from flask import Flask, jsonify, request
+from flask_orjson import OrjsonProvider
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the single-process dev server runs there
+    fcntl = None
 
 # --- Basic Setup ---
 # Determine the absolute path of the script's directory.
@@ -17,36 +32,97 @@ APP_ROOT = Path(__file__).parent.resolve()
 LOGS_DIR = APP_ROOT / 'logs'
 LOGS_DIR.mkdir(exist_ok=True)
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(LOGS_DIR / 'gologin_api.log'),
-        logging.StreamHandler()
-    ]
-)
+# basicConfig is a no-op once the root logger has handlers, but the FileHandler argument would
+# still open the log file; skip both when logging is already set up (re-import, gunicorn, etc.).
+if not logging.getLogger().handlers:
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(LOGS_DIR / 'gologin_api.log'),
+            logging.StreamHandler()
+        ]
+    )
 logger = logging.getLogger(__name__)
 
 
 # --- Application Configuration ---
 class Config:
     DATA_DIR = APP_ROOT / 'data'
+    ACCOUNTS_DB = DATA_DIR / 'gologin_accounts.db'
+    # Pre-SQLite accounts store; imported into ACCOUNTS_DB once on startup.
     ACCOUNTS_FILE = DATA_DIR / 'gologin_accounts.json'
     PROFILE_STATS_DIR = DATA_DIR / 'profile_stats'
+    STATS_COMPACT_LOCK_FILE = PROFILE_STATS_DIR / '.compact.lock'
     GOLOGIN_API_URL = "https://api.gologin.com/browser/v2"
+    GOLOGIN_LIMIT_MESSAGE = b"You have reached your free API requests limit"
+    # (connect, read) seconds. With _GL_SESSION's retries, an unreachable API blocks a worker for ~6.3s (two connect
+    # attempts plus backoff) and a stalled response for one 15s read; only 502/503/504 replies are re-requested.
+    GOLOGIN_API_TIMEOUT = (3.05, 15)
+    # Adopted accounts whose stats have not been updated for this long are released by the sweeper.
+    STALE_ADOPTION_TIMEOUT_NS = 5 * 60 * 1_000_000_000
+    STALE_SWEEP_INTERVAL = 60
+    # How often per-account stats logs are folded into their JSON snapshot.
+    STATS_COMPACT_INTERVAL = 30
+
+
+# --- Accounts Store ---
+# One SQLite row per account. The rows are cached in memory as a dict and only re-read when
+# PRAGMA data_version reports a commit from another connection; our own writes update the cache in place.
+_ACCOUNTS_DB: Dict[str, Any] = {"conn": None, "pid": None}
+_ACCOUNTS_CACHE: Dict[str, Any] = {"version": None, "data": None}
+_ACCOUNTS_LOCK = threading.RLock()
+# Set once the legacy JSON import has been checked in this process.
+_BACKFILL_DONE = False
+# GoLogin request headers per account, stored with the token they were built from.
+_HEADERS_CACHE: Dict[str, Tuple[str, Dict[str, str]]] = {}
+
+# --- Profile Stats Store ---
+# Each stats POST is appended to {account}_stats.log; the compactor folds the newest record into
+# {account}_stats.json and removes the log. Appenders hold a shared flock on the log while writing and
+# the compactor takes an exclusive one on the rotated file before folding it, which works across workers.
+# Without fcntl (Windows, single-process dev server) this in-process lock guards appends instead.
+_STATS_LOG_LOCK = threading.Lock()
+# Only one compaction pass runs at a time: this lock within a process, a flock on
+# STATS_COMPACT_LOCK_FILE across worker processes (released by the OS if a worker dies mid-pass).
+_STATS_COMPACT_LOCK = threading.Lock()
+# (epoch second, ISO string) for the last stats timestamp, reused within the same second.
+_TS_CACHE: Tuple[int, str] = (0, "")
+
+_ACCOUNTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    name TEXT PRIMARY KEY,
+    token TEXT,
+    profiles TEXT NOT NULL DEFAULT '[]',
+    profiles_etag TEXT,
+    adopted INTEGER NOT NULL DEFAULT 0,
+    adopted_by TEXT,
+    adopted_at TEXT,
+    adopted_at_ns INTEGER
+)
+"""
+_ACCOUNT_COLUMNS = "name, token, profiles, profiles_etag, adopted, adopted_by, adopted_at, adopted_at_ns"
+
+# --- GoLogin HTTP Session ---
+# Shared session so calls to the GoLogin API reuse pooled keep-alive connections.
+_GL_SESSION = requests.Session()
+_GL_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=50,
+    pool_maxsize=50,
+    max_retries=Retry(total=3, connect=1, read=0, backoff_factor=0.2, status_forcelist=[502, 503, 504], raise_on_status=False),
+))
 
 
 class DataManager:
-    """Handles all file-based data storage for the API."""
+    """Handles data storage for the API: accounts in SQLite, profile stats as JSON files."""
 
     @staticmethod
     def read_json_file(file_path: Path) -> Any:
-        if not file_path.exists():
-            return None
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError) as e:
+            return orjson.loads(file_path.read_bytes())
+        except FileNotFoundError:
+            return None
+        except (orjson.JSONDecodeError, IOError) as e:
             logger.error(f"Error reading or parsing JSON from {file_path}: {e}")
             return None
 
@@ -54,33 +130,136 @@ class DataManager:
     def write_json_file(file_path: Path, data: Any):
         try:
             file_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=4)
+            # Write to a per-thread temp file and swap it in, so readers never see a partial file.
+            tmp_path = file_path.with_name(f"{file_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+            os.replace(tmp_path, file_path)
             logger.info(f"Successfully wrote data to {file_path}")
+            return True
         except IOError as e:
             logger.error(f"Error writing JSON to {file_path}: {e}")
+            return False
 
     # --- GoLogin Account Management ---
+    @staticmethod
+    def _db() -> sqlite3.Connection:
+        """Returns this process's accounts DB connection. Callers must hold _ACCOUNTS_LOCK."""
+        # Connections must not be shared across a fork, so pre-forking servers open one per worker.
+        if _ACCOUNTS_DB["conn"] is None or _ACCOUNTS_DB["pid"] != os.getpid():
+            Config.DATA_DIR.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(Config.ACCOUNTS_DB, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(_ACCOUNTS_SCHEMA)
+            _ACCOUNTS_DB["conn"] = conn
+            _ACCOUNTS_DB["pid"] = os.getpid()
+            _ACCOUNTS_CACHE["version"] = None
+        return _ACCOUNTS_DB["conn"]
+
+    @staticmethod
+    def _row_to_account(row) -> Dict[str, Any]:
+        return {
+            "token": row[1],
+            "profiles": orjson.loads(row[2]),
+            "profiles_etag": row[3],
+            "adopted": bool(row[4]),
+            "adopted_by": row[5],
+            "adopted_at": row[6],
+            "adopted_at_ns": row[7],
+        }
+
+    @classmethod
+    def load_accounts(cls) -> Dict[str, Any]:
+        """Returns all accounts, re-reading the database only when another connection changed it."""
+        with _ACCOUNTS_LOCK:
+            conn = cls._db()
+            version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == _ACCOUNTS_CACHE["version"]:
+                return _ACCOUNTS_CACHE["data"]
+
+            rows = conn.execute(f"SELECT {_ACCOUNT_COLUMNS} FROM accounts ORDER BY rowid")
+            accounts = {row[0]: cls._row_to_account(row) for row in rows}
+            _ACCOUNTS_CACHE["version"] = version
+            _ACCOUNTS_CACHE["data"] = accounts
+            return accounts
+
+    @classmethod
+    def migrate_accounts(cls):
+        """Imports accounts from the legacy JSON file into an empty database. Runs once at startup."""
+        global _BACKFILL_DONE
+        if _BACKFILL_DONE:
+            return
+        # Skip parsing the legacy file altogether once the database holds accounts
+        with _ACCOUNTS_LOCK:
+            if cls._db().execute("SELECT 1 FROM accounts LIMIT 1").fetchone():
+                _BACKFILL_DONE = True
+                return
+
+        legacy = cls.read_json_file(Config.ACCOUNTS_FILE)
+        if not isinstance(legacy, dict) or not legacy:
+            _BACKFILL_DONE = True
+            return
+
+        rows = []
+        for account_name, account in legacy.items():
+            adopted_at = account.get("adopted_at")
+            adopted_at_ns = account.get("adopted_at_ns")
+            if adopted_at_ns is None and adopted_at:
+                try:
+                    adopted_at_ns = int(datetime.fromisoformat(adopted_at).timestamp() * 1e9)
+                except (ValueError, TypeError):
+                    adopted_at_ns = None
+            rows.append((
+                account_name,
+                account.get("token"),
+                orjson.dumps(account.get("profiles") or []).decode(),
+                account.get("profiles_etag"),
+                int(bool(account.get("adopted", False))),
+                account.get("adopted_by"),
+                adopted_at,
+                adopted_at_ns,
+            ))
+
+        with _ACCOUNTS_LOCK:
+            conn = cls._db()
+            # Re-check inside the write transaction: workers starting together all pass the check above,
+            # and only the first one to take the write lock may import.
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if conn.execute("SELECT 1 FROM accounts LIMIT 1").fetchone():
+                    conn.execute("ROLLBACK")
+                    _BACKFILL_DONE = True
+                    return
+                conn.executemany(f"INSERT INTO accounts ({_ACCOUNT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            _ACCOUNTS_CACHE["version"] = None
+            _BACKFILL_DONE = True
+        logger.info(f"Imported {len(rows)} accounts from {Config.ACCOUNTS_FILE} into {Config.ACCOUNTS_DB}.")
+
     @classmethod
     def get_all_accounts(cls) -> Dict[str, Any]:
-        accounts = cls.read_json_file(Config.ACCOUNTS_FILE)
-        accounts = accounts if isinstance(accounts, dict) else {}
-        # Backfill adoption keys for older records
-        changed = False
-        # Use a copy of keys for safe iteration while modifying the dictionary
-        for account_name in list(accounts.keys()):
-            account = accounts[account_name]
-            if "adopted" not in account:
-                account["adopted"] = False;
-                changed = True
-            if "adopted_by" not in account:
-                account["adopted_by"] = None;
-                changed = True
-            if "adopted_at" not in account:
-                account["adopted_at"] = None;
-                changed = True
-
-            # Auto-release stale adopted accounts
+        return cls.load_accounts()
+
+    @staticmethod
+    def get_auth_headers(account_name: str, token: str) -> Dict[str, str]:
+        """Returns the shared GoLogin headers for an account. Callers must not mutate the result."""
+        cached = _HEADERS_CACHE.get(account_name)
+        if cached is not None and cached[0] == token:
+            return cached[1]
+        headers = {'Authorization': f'Bearer {token}'}
+        _HEADERS_CACHE[account_name] = (token, headers)
+        return headers
+
+    @classmethod
+    def release_stale_adoptions(cls):
+        """Auto-releases adopted accounts whose stats are missing or too old."""
+        accounts = cls.load_accounts()
+        now_ns = time.time_ns()
+        # Use a snapshot of the items since endpoints may add accounts concurrently
+        for account_name, account in list(accounts.items()):
             if account.get("adopted"):
                 stats = cls.get_profile_stats(account_name)
                 release_due_to_inactivity = False
@@ -90,8 +269,11 @@ class DataManager:
                 else:
                     try:
                         last_updated_str = stats["last_updated"]
-                        last_updated_dt = datetime.fromisoformat(last_updated_str)
-                        if datetime.now() - last_updated_dt > timedelta(minutes=5):
+                        last_updated_ns = stats.get("last_updated_ns")
+                        if not isinstance(last_updated_ns, int):
+                            # Stats written before epoch timestamps were stored
+                            last_updated_ns = int(datetime.fromisoformat(last_updated_str).timestamp() * 1e9)
+                        if now_ns - last_updated_ns > Config.STALE_ADOPTION_TIMEOUT_NS:
                             release_due_to_inactivity = True
                             logger.warning(
                                 f"Releasing adopted account '{account_name}' due to inactivity (last update: {last_updated_str}).")
@@ -101,69 +283,298 @@ class DataManager:
                             f"Releasing adopted account '{account_name}' due to invalid 'last_updated' format in stats.")
 
                 if release_due_to_inactivity:
-                    account["adopted"] = False
-                    account["adopted_by"] = None
-                    account["adopted_at"] = None
-                    changed = True
+                    cls._release_if_unchanged(account_name, account.get("adopted_at_ns"))
+
+    @classmethod
+    def _release_if_unchanged(cls, account_name: str, adopted_at_ns: Optional[int]):
+        # Only release the claim we judged stale, not one made since the sweep read it
+        with _ACCOUNTS_LOCK:
+            accounts = cls.load_accounts()
+            cur = cls._db().execute(
+                "UPDATE accounts SET adopted = 0, adopted_by = NULL, adopted_at = NULL, adopted_at_ns = NULL "
+                "WHERE name = ? AND adopted = 1 AND adopted_at_ns IS ?",
+                (account_name, adopted_at_ns),
+            )
+            if cur.rowcount and account_name in accounts:
+                accounts[account_name].update(adopted=False, adopted_by=None, adopted_at=None, adopted_at_ns=None)
 
-        if changed:
-            cls.write_json_file(Config.ACCOUNTS_FILE, accounts)
-        return accounts
+    @classmethod
+    def claim_account(cls, account_name: str, adopted_by: str) -> Tuple[str, Optional[str]]:
+        """
+        Atomically adopts an account for a VPS unless another VPS holds it.
+        Returns ("claimed", adopted_by), ("conflict", current_holder) or ("not_found", None).
+        """
+        fields = {
+            "adopted": True,
+            "adopted_by": adopted_by,
+            "adopted_at": datetime.now().isoformat(),
+            "adopted_at_ns": time.time_ns(),
+        }
+        with _ACCOUNTS_LOCK:
+            accounts = cls.load_accounts()
+            conn = cls._db()
+            # The WHERE clause makes check-and-claim one statement, so it also holds across worker processes
+            cur = conn.execute(
+                "UPDATE accounts SET adopted = 1, adopted_by = ?, adopted_at = ?, adopted_at_ns = ? "
+                "WHERE name = ? AND (adopted = 0 OR adopted_by = ?)",
+                (adopted_by, fields["adopted_at"], fields["adopted_at_ns"], account_name, adopted_by),
+            )
+            if cur.rowcount:
+                if account_name in accounts:
+                    accounts[account_name].update(fields)
+                return "claimed", adopted_by
+            row = conn.execute("SELECT adopted_by FROM accounts WHERE name = ?", (account_name,)).fetchone()
+        if row is None:
+            return "not_found", None
+        return "conflict", row[0]
 
     @classmethod
     def set_adoption(cls, account_name: str, adopted: bool, adopted_by: Optional[str]):
-        accounts = cls.get_all_accounts()
-        if account_name not in accounts:
-            return False, "Account not found"
-        acct = accounts[account_name]
-        acct["adopted"] = adopted
-        acct["adopted_by"] = adopted_by if adopted else None
-        acct["adopted_at"] = datetime.now().isoformat() if adopted else None
-        cls.write_json_file(Config.ACCOUNTS_FILE, accounts)
+        fields = {
+            "adopted": adopted,
+            "adopted_by": adopted_by if adopted else None,
+            "adopted_at": datetime.now().isoformat() if adopted else None,
+            "adopted_at_ns": time.time_ns() if adopted else None,
+        }
+        with _ACCOUNTS_LOCK:
+            accounts = cls.load_accounts()
+            cur = cls._db().execute(
+                "UPDATE accounts SET adopted = ?, adopted_by = ?, adopted_at = ?, adopted_at_ns = ? WHERE name = ?",
+                (int(adopted), fields["adopted_by"], fields["adopted_at"], fields["adopted_at_ns"], account_name),
+            )
+            if not cur.rowcount:
+                return False, "Account not found"
+            if account_name in accounts:
+                accounts[account_name].update(fields)
         return True, None
 
     @classmethod
     def save_account(cls, account_name: str, token: str) -> bool:
-        accounts = cls.get_all_accounts()
-        accounts[account_name] = {
-            "token": token,
-            "profiles": [],
-            # NEW adoption fields
-            "adopted": False,
-            "adopted_by": None,
-            "adopted_at": None,
-        }
-        cls.write_json_file(Config.ACCOUNTS_FILE, accounts)
+        with _ACCOUNTS_LOCK:
+            accounts = cls.load_accounts()
+            # Upsert rather than REPLACE so an existing account keeps its rowid (and list position)
+            cls._db().execute(
+                "INSERT INTO accounts (name, token) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET token = excluded.token, profiles = '[]', profiles_etag = NULL, "
+                "adopted = 0, adopted_by = NULL, adopted_at = NULL, adopted_at_ns = NULL",
+                (account_name, token),
+            )
+            _HEADERS_CACHE.pop(account_name, None)
+            accounts[account_name] = {
+                "token": token,
+                "profiles": [],
+                "profiles_etag": None,
+                # NEW adoption fields
+                "adopted": False,
+                "adopted_by": None,
+                "adopted_at": None,
+                "adopted_at_ns": None,
+            }
         return True
 
     @classmethod
-    def update_account_profiles(cls, account_name: str, profile_ids: List[str]):
-        accounts = cls.get_all_accounts()
-        if account_name in accounts:
-            accounts[account_name]["profiles"] = profile_ids
-            cls.write_json_file(Config.ACCOUNTS_FILE, accounts)
+    def update_account_profiles(cls, account_name: str, profile_ids: List[str], etag: Optional[str] = None):
+        with _ACCOUNTS_LOCK:
+            accounts = cls.load_accounts()
+            cur = cls._db().execute(
+                "UPDATE accounts SET profiles = ?, profiles_etag = ? WHERE name = ?",
+                (orjson.dumps(profile_ids).decode(), etag, account_name),
+            )
+            if cur.rowcount and account_name in accounts:
+                accounts[account_name]["profiles"] = profile_ids
+                accounts[account_name]["profiles_etag"] = etag
+        if cur.rowcount:
             logger.info(f"Updated profile list for account '{account_name}'.")
         else:
             logger.warning(f"Attempted to update profiles for non-existent account '{account_name}'.")
 
     # --- Profile Stats Management ---
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def _stats_path(account_name: str) -> Path:
+        return Config.PROFILE_STATS_DIR / f"{account_name}_stats.json"
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def _stats_log_path(account_name: str) -> Path:
+        return Config.PROFILE_STATS_DIR / f"{account_name}_stats.log"
+
     @classmethod
     def get_stats_file_path(cls, account_name: str) -> Path:
-        return Config.PROFILE_STATS_DIR / f"{account_name}_stats.json"
+        return cls._stats_path(account_name)
+
+    @staticmethod
+    def _read_last_record(log_path: Path) -> Optional[Dict[str, Any]]:
+        """Returns the newest parseable record of a stats log, or None if there is none."""
+        try:
+            data = log_path.read_bytes()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.error(f"Error reading stats log {log_path}: {e}")
+            return None
+        for line in reversed(data.splitlines()):
+            try:
+                return orjson.loads(line)
+            except orjson.JSONDecodeError:
+                # A torn final line from an interrupted write; fall back to the one before
+                continue
+        return None
 
     @classmethod
     def save_profile_stats(cls, account_name: str, stats_data: Dict[str, Any]):
-        stats_file = cls.get_stats_file_path(account_name)
-        cls.write_json_file(stats_file, stats_data)
+        log_path = cls._stats_log_path(account_name)
+        record = orjson.dumps(stats_data, option=orjson.OPT_NON_STR_KEYS) + b"\n"
+        try:
+            log_path.parent.mkdir(parents=True, exist_ok=True)
+            if fcntl is None:
+                with _STATS_LOG_LOCK:
+                    cls._append_record(log_path, record)
+            else:
+                while not cls._append_record(log_path, record):
+                    # The compactor rotated the log between our open and lock; write to the new one
+                    pass
+        except OSError as e:
+            logger.error(f"Error appending stats to {log_path}: {e}")
+
+    @staticmethod
+    def _append_record(log_path: Path, record: bytes) -> bool:
+        """Appends one record to the log. Returns False if the file was rotated away before the write."""
+        # One O_APPEND write per record, so concurrent appends never interleave
+        fd = os.open(log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                # Shared lock: appends run in parallel, but the compactor's exclusive lock waits for them
+                fcntl.flock(fd, fcntl.LOCK_SH)
+                try:
+                    current = os.stat(log_path)
+                except FileNotFoundError:
+                    return False
+                opened = os.fstat(fd)
+                if (opened.st_dev, opened.st_ino) != (current.st_dev, current.st_ino):
+                    return False
+            os.write(fd, record)
+            return True
+        finally:
+            # Closing the descriptor also releases the flock
+            os.close(fd)
 
     @classmethod
     def get_profile_stats(cls, account_name: str) -> Optional[Dict[str, Any]]:
+        # Each POST replaces the stats wholesale, so the newest logged record wins over the snapshot
+        log_path = cls._stats_log_path(account_name)
+        for path in (log_path, log_path.with_suffix(".compacting")):
+            record = cls._read_last_record(path)
+            if record is not None:
+                return record
         stats_file = cls.get_stats_file_path(account_name)
         return cls.read_json_file(stats_file)
 
+    @staticmethod
+    @contextlib.contextmanager
+    def _compaction_pass_lock():
+        """Yields True if this process may run a compaction pass now, False if another one is running."""
+        if not _STATS_COMPACT_LOCK.acquire(blocking=False):
+            yield False
+            return
+        try:
+            if fcntl is None:
+                yield True
+                return
+            Config.PROFILE_STATS_DIR.mkdir(parents=True, exist_ok=True)
+            with open(Config.STATS_COMPACT_LOCK_FILE, "a") as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    yield False
+                    return
+                try:
+                    yield True
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            _STATS_COMPACT_LOCK.release()
+
+    @classmethod
+    def _fold_compacting(cls, account_name: str, compacting_path: Path) -> bool:
+        """Writes the newest record of a rotated log to the snapshot and removes it. False if it must be kept."""
+        with contextlib.ExitStack() as stack:
+            if fcntl is not None:
+                try:
+                    lock_file = stack.enter_context(open(compacting_path, "rb"))
+                except FileNotFoundError:
+                    return True
+                # Wait for appends that opened the file before it was rotated; later ones see the
+                # inode change and retry against the new log
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            record = cls._read_last_record(compacting_path)
+            # Keep the rotated log around (readers still consult it) until the snapshot is safely written
+            if record is not None and not cls.write_json_file(cls.get_stats_file_path(account_name), record):
+                return False
+            compacting_path.unlink(missing_ok=True)
+            return True
+
+    @classmethod
+    def compact_profile_stats(cls):
+        """Folds every stats log into its JSON snapshot and removes the log."""
+        with cls._compaction_pass_lock() as acquired:
+            if not acquired:
+                return
+            account_names = {path.name[:-len("_stats.log")] for path in Config.PROFILE_STATS_DIR.glob("*_stats.log")}
+            # Rotated logs left by a failed snapshot write or a worker killed mid-pass.
+            # Holding the pass lock means nobody else is working on them.
+            account_names.update(
+                path.name[:-len("_stats.compacting")] for path in Config.PROFILE_STATS_DIR.glob("*_stats.compacting")
+            )
+            for account_name in account_names:
+                log_path = cls._stats_log_path(account_name)
+                compacting_path = log_path.with_suffix(".compacting")
+                # Fold the leftover first; it is older than anything in the live log
+                if compacting_path.exists() and not cls._fold_compacting(account_name, compacting_path):
+                    continue
+                with _STATS_LOG_LOCK if fcntl is None else contextlib.nullcontext():
+                    try:
+                        os.replace(log_path, compacting_path)
+                    except FileNotFoundError:
+                        continue
+                cls._fold_compacting(account_name, compacting_path)
+
+
+def _stale_adoption_sweeper_loop():
+    while True:
+        time.sleep(Config.STALE_SWEEP_INTERVAL)
+        try:
+            DataManager.release_stale_adoptions()
+        except Exception:
+            logger.exception("Stale adoption sweep failed.")
+
+
+def start_stale_adoption_sweeper():
+    """Starts the background thread that periodically releases stale adoptions."""
+    thread = threading.Thread(target=_stale_adoption_sweeper_loop, name="stale-adoption-sweeper", daemon=True)
+    thread.start()
+    return thread
+
+
+def _stats_compactor_loop():
+    while True:
+        time.sleep(Config.STATS_COMPACT_INTERVAL)
+        try:
+            DataManager.compact_profile_stats()
+        except Exception:
+            logger.exception("Stats compaction failed.")
+
+
+def start_stats_compactor():
+    """Starts the background thread that periodically compacts stats logs into snapshots."""
+    thread = threading.Thread(target=_stats_compactor_loop, name="stats-compactor", daemon=True)
+    thread.start()
+    return thread
+
 
 # --- Flask App Initialization ---
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 data_manager = DataManager()
 
 
@@ -177,6 +588,7 @@ def ensure_directories():
     except Exception as e:
         logger.critical(f"Could not create necessary directories: {e}", exc_info=True)
         raise
+    DataManager.migrate_accounts()
 
 
 @app.errorhandler(404)
@@ -238,15 +650,15 @@ def adopt_account(account_name):
     if action == "claim":
         if not vps_id:
             return jsonify({"error": "adopted_by is required for claim"}), 400
-        if acct.get("adopted") and acct.get("adopted_by") != vps_id:
+        status, holder = data_manager.claim_account(account_name, vps_id)
+        if status == "conflict":
             # already claimed by someone else
             return jsonify({
                 "status": "conflict",
-                "message": f"Account already adopted by {acct.get('adopted_by')}"
+                "message": f"Account already adopted by {holder}"
             }), 409
-        ok, err = data_manager.set_adoption(account_name, True, vps_id)
-        if not ok:
-            return jsonify({"error": err or "Failed to claim"}), 500
+        if status != "claimed":
+            return jsonify({"error": f"Account '{account_name}' not found."}), 404
         return jsonify({"status": "claimed", "account_name": account_name, "adopted_by": vps_id})
 
     # release
@@ -279,15 +691,32 @@ def fetch_and_save_profiles(account_name):
     if not account_info:
         return jsonify({"error": f"Account '{account_name}' not found."}), 404
 
-    token = account_info.get("token")
-    headers = {'Authorization': f'Bearer {token}'}
+    headers = data_manager.get_auth_headers(account_name, account_info.get("token"))
+    # Let GoLogin answer 304 when the profile list is unchanged since the last fetch.
+    if account_info.get("profiles_etag"):
+        headers = {**headers, 'If-None-Match': account_info["profiles_etag"]}
 
     try:
         logger.info(f"Fetching profiles from GoLogin API for account '{account_name}'...")
-        response = requests.get(Config.GOLOGIN_API_URL, headers=headers, timeout=15)
+        response = _GL_SESSION.get(Config.GOLOGIN_API_URL, headers=headers, timeout=Config.GOLOGIN_API_TIMEOUT)
+
+        if response.status_code == 304:
+            logger.info(f"Profile list for account '{account_name}' is unchanged.")
+            profile_ids = account_info.get("profiles", [])
+            return jsonify({
+                "status": "success",
+                "account_name": account_name,
+                "profiles_fetched": len(profile_ids),
+                "profile_ids": profile_ids
+            })
+
         response.raise_for_status()
 
-        response_data = response.json()
+        try:
+            response_data = orjson.loads(response.content)
+        except orjson.JSONDecodeError as e:
+            logger.error(f"GoLogin API returned invalid JSON: {e}")
+            return jsonify({"error": "Received unexpected data format from GoLogin API."}), 500
 
         if not isinstance(response_data, dict) or 'profiles' not in response_data:
             logger.error(f"GoLogin API returned unexpected data format: {response_data}")
@@ -299,9 +728,9 @@ def fetch_and_save_profiles(account_name):
             logger.error(f"The 'profiles' key did not contain a list. Found: {type(profiles_list)}")
             return jsonify({"error": "Received unexpected data format inside 'profiles' key."}), 500
 
-        profile_ids = [p.get('id') for p in profiles_list if 'id' in p]
+        profile_ids = list(filter(None, (p.get('id') for p in profiles_list)))
 
-        data_manager.update_account_profiles(account_name, profile_ids)
+        data_manager.update_account_profiles(account_name, profile_ids, response.headers.get("ETag"))
 
         return jsonify({
             "status": "success",
@@ -334,7 +763,17 @@ def save_stats(account_name):
     if not stats_data:
         return jsonify({"error": "Request must include stats data in JSON body."}), 400
 
-    stats_data["last_updated"] = datetime.now().isoformat()
+    global _TS_CACHE
+    now_ns = time.time_ns()
+    second = now_ns // 1_000_000_000
+    # Reformat the ISO stamp at most once per second; the tuple swap keeps it consistent across threads
+    cached_second, cached_iso = _TS_CACHE
+    if second != cached_second:
+        cached_iso = datetime.fromtimestamp(second).isoformat()
+        _TS_CACHE = (second, cached_iso)
+
+    stats_data["last_updated"] = cached_iso
+    stats_data["last_updated_ns"] = now_ns
     data_manager.save_profile_stats(account_name, stats_data)
 
     return jsonify({"status": "success", "message": f"Stats saved for account '{account_name}'."})
@@ -351,21 +790,23 @@ def check_account_limit(account_name):
     if not account_info:
         return jsonify({"error": f"Account '{account_name}' not found."}), 404
 
-    token = account_info.get("token")
-    headers = {'Authorization': f'Bearer {token}'}
+    headers = data_manager.get_auth_headers(account_name, account_info.get("token"))
 
     try:
-        response = requests.get(Config.GOLOGIN_API_URL, headers=headers, timeout=15)
+        # The limit message sits at the start of the body, so only the first 4 KB are read.
+        with _GL_SESSION.get(Config.GOLOGIN_API_URL, headers=headers, timeout=Config.GOLOGIN_API_TIMEOUT, stream=True) as response:
+            # raw.read(amt) keeps reading across transfer chunks until it has amt bytes or hits EOF
+            head = response.raw.read(4096, decode_content=True)
 
-        if "You have reached your free API requests limit" in response.text:
-            logger.warning(f"API limit reached for account '{account_name}'.")
-            return jsonify({
-                "account_name": account_name,
-                "status": "limit_exceeded",
-                "limit_reached": True
-            })
+            if Config.GOLOGIN_LIMIT_MESSAGE in head:
+                logger.warning(f"API limit reached for account '{account_name}'.")
+                return jsonify({
+                    "account_name": account_name,
+                    "status": "limit_exceeded",
+                    "limit_reached": True
+                })
 
-        response.raise_for_status()
+            response.raise_for_status()
 
         logger.info(f"API limit is OK for account '{account_name}'.")
         return jsonify({
@@ -378,13 +819,17 @@ def check_account_limit(account_name):
         if e.response.status_code == 401:
             return jsonify({"error": "Unauthorized. The API token for this account is invalid."}), 401
         return jsonify({"error": f"HTTP Error from GoLogin API: {e.response.status_code}"}), e.response.status_code
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError) as e:
+        # Reading response.raw directly surfaces urllib3's own exceptions
         return jsonify({"error": f"Network error connecting to GoLogin API: {e}"}), 503
 
 
 # --- Main Execution ---
+# Development fallback only; production runs under gunicorn via wsgi.py.
 if __name__ == "__main__":
     ensure_directories()
+    start_stale_adoption_sweeper()
+    start_stats_compactor()
     try:
         app.run(host="0.0.0.0", port=8080, debug=False)
     except Exception as e:
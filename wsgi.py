@@ -0,0 +1,17 @@
+# wsgi.py
+# Production entry point:
+#   gunicorn wsgi:app -k gthread -w 4 --threads 8 --bind 0.0.0.0:8080
+# Each worker opens its own SQLite connection; WAL mode serializes writes across workers
+# and PRAGMA data_version keeps every worker's in-memory accounts cache current.
+from gologin_api import (
+    app,
+    ensure_directories,
+    start_stale_adoption_sweeper,
+    start_stats_compactor,
+)
+
+ensure_directories()
+start_stale_adoption_sweeper()
+start_stats_compactor()
+
+__all__ = ["app"]